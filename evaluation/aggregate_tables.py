@@ -57,3 +57,7 @@ def main():
         struct_hd95.append(row)
     pd.DataFrame(struct_hd95).to_csv(out_dir / "per_structure_hd95_by_budget.csv", index=False)
     print("[OK] Table 1 and Table 2 ->", out_dir)
+
+
+if __name__ == "__main__":
+    main()
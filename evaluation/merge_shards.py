@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Merge shard partials from run_shard.py into per-case CSVs.
+
+Validates that every shard and every (budget, seed, case) is present exactly once,
+then writes (same columns as compute_metrics.py):
+  per_seed/{budget}_seed{seed}_per_case.csv  one file per (budget, seed)
+  {budget}_per_case.csv                      per-case mean over seeds, for
+                                             aggregate_tables.py and paired_tests.py
+
+Usage:
+    python merge_shards.py --shard_dir artifacts/shards --out_dir artifacts
+"""
+import argparse
+import csv
+import math
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.metrics import metric_fields
+from utils.sharding import load_partial, merge_partials
+
+
+def write_rows(path: Path, fields: list, rows: list) -> None:
+    with path.open("w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+    print("[OK] Wrote", path, len(rows), "cases")
+
+
+def average_over_seeds(merged: dict, fields: list) -> dict:
+    """{budget: rows} with each metric averaged per case over seeds (NaNs skipped)."""
+    by_budget = {}
+    for (budget, _), rows in merged.items():
+        by_budget.setdefault(budget, []).append(rows)
+    out = {}
+    for budget, runs in by_budget.items():
+        rows = []
+        for per_seed in zip(*runs):
+            row = {"case": per_seed[0]["case"]}
+            for col in fields[1:]:
+                vals = [r[col] for r in per_seed if not math.isnan(r[col])]
+                row[col] = sum(vals) / len(vals) if vals else float("nan")
+            rows.append(row)
+        out[budget] = rows
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge shard partials into per-case CSVs")
+    ap.add_argument("--shard_dir", type=str, default="artifacts/shards")
+    ap.add_argument("--partials", type=str, nargs="+", default=None,
+                    help="Explicit partial files (default: all shard_*_of_*.json in --shard_dir)")
+    ap.add_argument("--out_dir", type=str, default="artifacts")
+    args = ap.parse_args()
+
+    paths = [Path(p) for p in args.partials] if args.partials else sorted(Path(args.shard_dir).glob("shard_*_of_*.json"))
+    if not paths:
+        raise FileNotFoundError(f"No shard partials found in {args.shard_dir}")
+    parts = [load_partial(p) for p in paths]
+    merged = merge_partials(parts)
+
+    fields = metric_fields(parts[0]["grid"]["num_classes"])
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    seed_dir = out_dir / "per_seed"
+    seed_dir.mkdir(parents=True, exist_ok=True)
+    for (budget, seed), rows in merged.items():
+        write_rows(seed_dir / ("%s_seed%d_per_case.csv" % (budget, seed)), fields, rows)
+    for budget, rows in average_over_seeds(merged, fields).items():
+        write_rows(out_dir / ("%s_per_case.csv" % budget), fields, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -49,6 +49,9 @@ def main():
         if not path.exists():
             raise FileNotFoundError(f"Input not found: {path}")
         budget = path.stem.split("_")[0]
+        if budget in data:
+            raise ValueError(f"More than one input for budget {budget}; pass one CSV per budget "
+                             "(e.g. the seed-averaged {budget}_per_case.csv from merge_shards.py)")
         data[budget] = load_fg_dice(path)
 
     common = set(data[list(data.keys())[0]])
@@ -82,3 +85,7 @@ def main():
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text("\n".join(lines) + "\n")
     print(f"[OK] Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
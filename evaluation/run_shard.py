@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Evaluate one deterministic shard of the (budget, seed, case) grid.
+
+The grid is split round-robin into N shards; shard i writes a self-describing
+partial (grid spec, input and item checksums, metric rows) to
+{out_dir}/shard_{i}_of_{N}.json as strict JSON (NaN metrics are written as null). Merge partials with merge_shards.py.
+
+Usage:
+    python run_shard.py --gt_dir labelsTs --pred_template "predictions/{budget}/seed{seed}" \\
+        --test_ids splits/test_ids.txt --budgets L5 L10 L20 L40 --seeds 0 1 2 --shard 0/8 --out_dir artifacts/shards
+    # Local stand-in for a cluster: run all N shards as N processes.
+    python run_shard.py ... --local 4 --out_dir artifacts/shards
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.io import find_case_path, read_case_ids, read_nii
+from utils.metrics import case_metrics
+from utils.sharding import (SCHEMA, build_work_list, encode_row, file_sha256, grid_digest, inputs_digest,
+                            items_digest, parse_shard, shard_items)
+
+
+def run_local(args, n):
+    """Launch shards 0..n-1 as separate processes and wait for all of them."""
+    procs = []
+    for i in range(n):
+        cmd = [sys.executable, str(Path(__file__).resolve()),
+               "--gt_dir", args.gt_dir, "--pred_template", args.pred_template,
+               "--test_ids", args.test_ids, "--budgets", *args.budgets,
+               "--seeds", *[str(s) for s in args.seeds], "--shard", "%d/%d" % (i, n),
+               "--out_dir", args.out_dir, "--num_classes", str(args.num_classes)]
+        if args.max_mem_gb is not None:
+            cmd += ["--max_mem_gb", str(args.max_mem_gb)]
+        if args.halo_mm is not None:
+            cmd += ["--halo_mm", str(args.halo_mm)]
+        procs.append(subprocess.Popen(cmd))
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Shards failed: {', '.join('%d/%d' % (i, n) for i in failed)}")
+    print(f"[OK] {n} local shards -> {args.out_dir}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Evaluate one shard of the budget x seed x case grid")
+    ap.add_argument("--gt_dir", type=str, required=True)
+    ap.add_argument("--pred_template", type=str, required=True,
+                    help="Prediction directory, formatted with {budget} and {seed}")
+    ap.add_argument("--test_ids", type=str, required=True)
+    ap.add_argument("--budgets", type=str, nargs="+", default=["L5", "L10", "L20", "L40"])
+    ap.add_argument("--seeds", type=int, nargs="+", default=[0])
+    group = ap.add_mutually_exclusive_group(required=True)
+    group.add_argument("--shard", type=str, help="Shard to run, as i/N (0-based)")
+    group.add_argument("--local", type=int, help="Run all N shards as local processes")
+    ap.add_argument("--out_dir", type=str, default="artifacts/shards")
+    ap.add_argument("--num_classes", type=int, default=8)
+    ap.add_argument("--max_mem_gb", type=float, default=None,
+                    help="Cap the HD95 distance-transform working set (z-slab evaluation)")
+    ap.add_argument("--halo_mm", type=float, default=None,
+                    help="Slab halo for --max_mem_gb; set to the largest expected surface distance")
+    args = ap.parse_args()
+    if args.max_mem_gb is not None and not args.max_mem_gb > 0:
+        ap.error("--max_mem_gb must be > 0")
+    if args.halo_mm is not None and not args.halo_mm >= 0:
+        ap.error("--halo_mm must be >= 0")
+    if args.halo_mm is not None and args.max_mem_gb is None:
+        ap.error("--halo_mm requires --max_mem_gb")
+
+    if args.local is not None:
+        if args.local < 1:
+            raise ValueError("--local must be >= 1")
+        run_local(args, args.local)
+        return
+
+    index, num_shards = parse_shard(args.shard)
+    case_ids = read_case_ids(Path(args.test_ids))
+    # Input sources are part of the grid so shards of different runs never merge.
+    grid = {"budgets": args.budgets, "seeds": args.seeds, "case_ids": case_ids, "num_classes": args.num_classes,
+            "gt_dir": str(Path(args.gt_dir).resolve()),
+            "pred_template": str(Path(args.pred_template).resolve())}
+    work = build_work_list(args.budgets, args.seeds, case_ids)
+    gt_dir = Path(args.gt_dir)
+
+    items = []
+    for budget, seed, cid in shard_items(work, index, num_shards):
+        pred_dir = Path(args.pred_template.format(budget=budget, seed=seed))
+        try:
+            gt_path = find_case_path(gt_dir, cid)
+            pred_path = find_case_path(pred_dir, cid)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Missing GT or pred for {cid} (budget={budget}, seed={seed})")
+
+        gt, spacing = read_nii(gt_path)
+        pr, _ = read_nii(pred_path)
+        row = {"case": cid}
+        row.update(case_metrics(gt, pr, spacing, args.num_classes, args.max_mem_gb, args.halo_mm))
+        items.append({"budget": budget, "seed": seed, "case": cid,
+                      "gt_path": str(gt_path), "pred_path": str(pred_path),
+                      "gt_sha256": file_sha256(gt_path), "pred_sha256": file_sha256(pred_path),
+                      "row": encode_row(row)})
+
+    partial = {"schema": SCHEMA, "shard_index": index, "num_shards": num_shards,
+               "grid": grid, "grid_sha256": grid_digest(grid),
+               "inputs_sha256": inputs_digest(items), "items_sha256": items_digest(items),
+               "items": items}
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / ("shard_%d_of_%d.json" % (index, num_shards))
+    tmp = out_path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(partial, indent=1, allow_nan=False))
+    tmp.replace(out_path)
+    print("[OK] Wrote", out_path, len(items), "items")
+
+
+if __name__ == "__main__":
+    main()
@@ -52,3 +52,7 @@ def main():
     plt.savefig(out_dir / "boxplot_fg_dice.png", dpi=200, bbox_inches="tight")
     plt.close()
     print("[OK]", out_dir / "boxplot_fg_dice.png")
+
+
+if __name__ == "__main__":
+    main()
@@ -48,3 +48,7 @@ def main():
     plt.savefig(out_path, dpi=200, bbox_inches="tight")
     plt.close()
     print("[OK]", out_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -68,3 +68,7 @@ def main():
         plt.savefig(out_dir / "per_class_hd95_vs_budget.png", dpi=200, bbox_inches="tight")
         plt.close()
         print("[OK]", out_dir / "per_class_hd95_vs_budget.png")
+
+
+if __name__ == "__main__":
+    main()
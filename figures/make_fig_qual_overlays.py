@@ -84,3 +84,7 @@ def main():
     fig.savefig(out_dir / ("%s_GT_L5_L10_L20_L40.png" % cid), dpi=200, bbox_inches="tight")
     plt.close()
     print("[OK]", out_dir / ("%s_GT_L5_L10_L20_L40.png" % cid))
+
+
+if __name__ == "__main__":
+    main()
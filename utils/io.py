@@ -44,3 +44,21 @@ def read_nii(path: Path) -> Tuple[np.ndarray, Tuple[float, float, float]]:
     if HAS_SITK:
         return read_nii_sitk(path)
     return read_nii_nib(path)
+
+
+def find_case_path(d: Path, case_id: str) -> Path:
+    """Return {case_id}.nii.gz or {case_id}.nii under d; raise if neither exists."""
+    d = Path(d)
+    for ext in (".nii.gz", ".nii"):
+        p = d / (case_id + ext)
+        if p.exists():
+            return p
+    raise FileNotFoundError(f"No NIfTI for {case_id} in {d}")
+
+
+def read_case_ids(path: Path) -> list:
+    """Read one case ID per line, skipping blank lines."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Test IDs file not found: {path}")
+    return [line.strip() for line in path.read_text().splitlines() if line.strip()]
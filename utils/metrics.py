@@ -1,8 +1,19 @@
 """Metric computation for whole-heart segmentation (Dice, HD95)."""
+import math
+import warnings
+
 import numpy as np
 from scipy.ndimage import binary_erosion, distance_transform_edt
+from scipy.spatial import cKDTree
 
 K = 8
+# Working-set model for hd95_mm_chunked, in bytes (conservative).
+SLAB_BYTES_PER_VOXEL = 64  # EDT peak (~50) plus slab surface, complement and erosion temporaries
+SURFACE_BYTES_PER_VOXEL = 4  # surface extraction on a run of planes
+SLAB_BYTES_PER_POINT = 96  # per core surface voxel: index, z, distance, bound, pending coords
+KDTREE_BYTES_PER_POINT = 96  # KD-tree fallback: voxel indices, scaled coords, tree
+QUERY_BYTES_PER_POINT = 96  # KD-tree query batch: coords, scaled coords, nearest, delta
+STORE_BYTES_PER_POINT = 16  # gathered distances plus the percentile's copy
 
 
 def dice(pred: np.ndarray, gt: np.ndarray) -> float:
@@ -42,3 +53,225 @@ def hd95_mm(gt: np.ndarray, pr: np.ndarray, spacing_xyz_mm: tuple) -> float:
     if d1.size == 0 or d2.size == 0:
         return float("nan")
     return float(np.percentile(np.concatenate([d1, d2]), 95))
+
+
+def _crop_to_union(gt: np.ndarray, pr: np.ndarray) -> tuple:
+    """Crop both masks (as views) to the bounding box of their union; surfaces are unchanged."""
+    box = []
+    for ax in range(gt.ndim):
+        other = tuple(a for a in range(gt.ndim) if a != ax)
+        hit = np.flatnonzero(np.logical_or(gt.any(axis=other), pr.any(axis=other)))
+        box.append(slice(int(hit[0]), int(hit[-1]) + 1))
+    box = tuple(box)
+    return gt[box], pr[box]
+
+
+def _surface_planes(mask: np.ndarray, z0: int, z1: int) -> np.ndarray:
+    """surface(mask)[z0:z1], computed from planes z0-1 .. z1 only."""
+    p0, p1 = max(0, z0 - 1), min(mask.shape[0], z1 + 1)
+    sub = mask[p0:p1]
+    er = binary_erosion(sub, iterations=1, border_value=0)
+    np.logical_not(er, out=er)
+    np.logical_and(sub, er, out=er)
+    return er[z0 - p0:z1 - p0]
+
+
+def _surface_counts(mask: np.ndarray, chunk: int) -> np.ndarray:
+    """Surface voxels per z-plane, computed `chunk` planes at a time."""
+    nz = mask.shape[0]
+    return np.concatenate([_surface_planes(mask, z, min(nz, z + chunk)).sum(axis=(1, 2))
+                           for z in range(0, nz, chunk)])
+
+
+def _nearest_by_zrange(pending: np.ndarray, m_dst: np.ndarray, dst_counts: np.ndarray, sp: np.ndarray,
+                       max_points: int, max_planes: int) -> np.ndarray:
+    """
+    Exact distances (mm) from voxel indices `pending` to the nearest surface voxel of m_dst.
+
+    The surface is visited in runs of whole z-planes (at most max_planes, holding at most
+    max_points surface voxels, at least one plane), and queries go in batches of max_points,
+    so neither the KD-tree nor a batch spans the whole surface. Runs are visited nearest
+    first and skipped for queries whose best distance is already below their z-gap.
+    """
+    best = np.full(len(pending), np.inf)
+    zz = pending[:, 0]
+    nz = len(dst_counts)
+    runs = []
+    z0 = 0
+    while z0 < nz:
+        z1, n = z0 + 1, int(dst_counts[z0])
+        while z1 < nz and z1 - z0 < max_planes and n + dst_counts[z1] <= max_points:
+            n += int(dst_counts[z1])
+            z1 += 1
+        if n:
+            runs.append((z0, z1))
+        z0 = z1
+    # Nearest runs first, so best shrinks early and far runs are skipped.
+    zmin, zmax = int(zz.min()), int(zz.max())
+    runs.sort(key=lambda r: max(r[0] - zmax, zmin - (r[1] - 1), 0))
+    for z0, z1 in runs:
+        gap = np.maximum(np.maximum(z0 - zz, zz - (z1 - 1)), 0) * sp[0]
+        sel = np.flatnonzero(gap < best)
+        if not sel.size:
+            continue
+        dst_pts = np.argwhere(_surface_planes(m_dst, z0, z1))
+        dst_pts[:, 0] += z0
+        tree = cKDTree(dst_pts * sp)
+        for b in range(0, sel.size, max_points):
+            idx = sel[b:b + max_points]
+            q = pending[idx]
+            nearest = dst_pts[tree.query(q * sp)[1]]
+            # Same arithmetic as distance_transform_edt so results match hd95_mm exactly.
+            delta = (nearest - q).astype(np.float64) * sp
+            best[idx] = np.minimum(best[idx], np.sqrt(np.add.reduce(delta * delta, axis=1)))
+        del tree, dst_pts
+    return best
+
+
+def _surface_distances_slabbed(m_src: np.ndarray, m_dst: np.ndarray, src_counts: np.ndarray, dst_counts: np.ndarray,
+                               sp: np.ndarray, halo: int, budget: int, out: np.ndarray) -> None:
+    """
+    Write into `out` the distance (mm) from each m_src surface voxel to the m_dst surface.
+
+    Slabs of core planes are padded by `halo` planes on both sides and grown while their
+    working set fits in `budget` bytes (at least one core plane). A slab distance is exact
+    when it does not exceed the z-distance to the padded edge; the rest are resolved by
+    _nearest_by_zrange within half the budget.
+    """
+    nz = m_src.shape[0]
+    plane = m_src.shape[1] * m_src.shape[2]
+    fallback = budget // 2
+    max_points = max(1, fallback // (KDTREE_BYTES_PER_POINT + QUERY_BYTES_PER_POINT))
+    max_planes = max(1, fallback // (plane * SURFACE_BYTES_PER_VOXEL))
+    cum = np.concatenate([[0], np.cumsum(src_counts)])
+
+    def fits(c0, c1):
+        padded = min(nz, c1 + halo) - max(0, c0 - halo)
+        pts = int(cum[c1] - cum[c0])
+        return (padded * plane * SLAB_BYTES_PER_VOXEL + pts * SLAB_BYTES_PER_POINT <= budget
+                and pts * SLAB_BYTES_PER_POINT <= budget - fallback)
+
+    pos = 0
+    c0 = 0
+    while c0 < nz:
+        c1 = c0 + 1
+        while c1 < nz and fits(c0, c1 + 1):
+            c1 += 1
+        n_src = int(cum[c1] - cum[c0])
+        if n_src:
+            a0, a1 = max(0, c0 - halo), min(nz, c1 + halo)
+            flat = np.flatnonzero(_surface_planes(m_src, c0, c1))
+            zz = flat // plane + c0
+            if dst_counts[a0:a1].any():
+                dst = _surface_planes(m_dst, a0, a1)
+                dt = distance_transform_edt(~dst, sampling=sp)
+                del dst
+                d = dt[c0 - a0:c1 - a0].reshape(-1)[flat]
+                del dt
+            else:
+                d = np.full(n_src, np.inf)
+            lo = (zz - a0 + 1) * sp[0] if a0 > 0 else np.inf
+            hi = (a1 - zz) * sp[0] if a1 < nz else np.inf
+            ok = d <= np.minimum(lo, hi)
+            n_ok = int(ok.sum())
+            out[pos:pos + n_ok] = d[ok]
+            if n_ok < n_src:
+                shape = (c1 - c0,) + m_src.shape[1:]
+                pending = np.stack(np.unravel_index(flat[~ok], shape), axis=1)
+                pending[:, 0] += c0
+                out[pos + n_ok:pos + n_src] = _nearest_by_zrange(pending, m_dst, dst_counts, sp,
+                                                                 max_points, max_planes)
+            pos += n_src
+        c0 = c1
+
+
+def hd95_mm_chunked(gt: np.ndarray, pr: np.ndarray, spacing_xyz_mm: tuple, max_mem_gb: float, halo_mm: float = None) -> float:
+    """
+    Same result as hd95_mm, with its working set kept under max_mem_gb.
+
+    Masks are cropped to their union's bounding box. Surfaces and distance transforms are
+    computed on z-slabs padded by a halo; set halo_mm to the largest surface distance
+    expected so nearly every voxel is resolved inside its slab (default: a quarter of the
+    slab depth; clamped with a warning if it does not fit). Voxels beyond the halo are
+    resolved exactly by a KD-tree over z-ranges of the other surface. The cap covers
+    everything allocated here, including 16 bytes per surface voxel for the gathered
+    distances; the caller's input masks are not counted.
+    """
+    if not max_mem_gb > 0:
+        raise ValueError("max_mem_gb must be > 0, got %r" % (max_mem_gb,))
+    if halo_mm is not None and not halo_mm >= 0:
+        raise ValueError("halo_mm must be >= 0, got %r" % (halo_mm,))
+    gt = gt.astype(bool, copy=False)
+    pr = pr.astype(bool, copy=False)
+    if gt.sum() == 0 and pr.sum() == 0:
+        return 0.0
+    if gt.sum() == 0 or pr.sum() == 0:
+        return float("nan")
+    gt, pr = _crop_to_union(gt, pr)
+    sp = np.asarray((spacing_xyz_mm[2], spacing_xyz_mm[1], spacing_xyz_mm[0]), dtype=np.float64)
+
+    nz = gt.shape[0]
+    plane = gt.shape[1] * gt.shape[2]
+    cap = int(max_mem_gb * 1024 ** 3)
+    chunk = max(1, cap // (plane * SURFACE_BYTES_PER_VOXEL))
+    c_gt = _surface_counts(gt, chunk)
+    c_pr = _surface_counts(pr, chunk)
+    n_gt, n_pr = int(c_gt.sum()), int(c_pr.sum())
+    if n_gt == 0 or n_pr == 0:
+        return float("nan")
+    budget = cap - (n_gt + n_pr) * STORE_BYTES_PER_POINT
+    if budget <= 0:
+        raise ValueError("max_mem_gb=%g cannot hold the %d surface distances alone (%.3g GB)"
+                         % (max_mem_gb, n_gt + n_pr, (n_gt + n_pr) * STORE_BYTES_PER_POINT / 1024 ** 3))
+    depth = budget // (plane * SLAB_BYTES_PER_VOXEL)
+    if depth < 1:
+        raise ValueError("max_mem_gb=%g too small for a single %dx%d slab plane"
+                         % (max_mem_gb, gt.shape[1], gt.shape[2]))
+    if depth >= nz:
+        halo = nz
+    else:
+        halo = math.ceil(halo_mm / sp[0]) if halo_mm is not None else depth // 4
+        if 2 * halo + 1 > depth:
+            warnings.warn("halo of %d planes does not fit %d-plane slabs under max_mem_gb=%g; using %d"
+                          % (halo, depth, max_mem_gb, (depth - 1) // 2))
+            halo = (depth - 1) // 2
+
+    dists = np.empty(n_pr + n_gt)
+    _surface_distances_slabbed(pr, gt, c_pr, c_gt, sp, halo, budget, dists[:n_pr])
+    _surface_distances_slabbed(gt, pr, c_gt, c_pr, sp, halo, budget, dists[n_pr:])
+    return float(np.percentile(dists, 95))
+
+
+def metric_fields(num_classes: int = K) -> list:
+    """CSV column order for per-case metric rows."""
+    return (["case", "fg_mean_dice", "fg_mean_hd95_mm"]
+            + ["dice_%d" % k for k in range(1, num_classes + 1)]
+            + ["hd95_%d_mm" % k for k in range(1, num_classes + 1)])
+
+
+def case_metrics(gt: np.ndarray, pr: np.ndarray, spacing_xyz_mm: tuple, num_classes: int = K,
+                 max_mem_gb: float = None, halo_mm: float = None) -> dict:
+    """Per-structure Dice/HD95 and their foreground means for one case (no 'case' key).
+
+    With max_mem_gb set, HD95 uses the memory-bounded hd95_mm_chunked (halo_mm passed through).
+    """
+    dice_k = {}
+    hd95_k = {}
+    for k in range(1, num_classes + 1):
+        mgt = (gt == k)
+        mpr = (pr == k)
+        dice_k[k] = float(dice(mgt, mpr))
+        if max_mem_gb is None:
+            hd95_k[k] = float(hd95_mm(mgt, mpr, spacing_xyz_mm))
+        else:
+            hd95_k[k] = float(hd95_mm_chunked(mgt, mpr, spacing_xyz_mm, max_mem_gb, halo_mm))
+
+    fg_dice = float(sum(dice_k.values()) / num_classes)
+    hd_vals = [v for v in hd95_k.values() if not np.isnan(v)]
+    fg_hd95 = float(sum(hd_vals) / len(hd_vals)) if hd_vals else float("nan")
+
+    row = {"fg_mean_dice": fg_dice, "fg_mean_hd95_mm": fg_hd95}
+    for k in range(1, num_classes + 1):
+        row["dice_%d" % k] = dice_k[k]
+        row["hd95_%d_mm" % k] = hd95_k[k]
+    return row
@@ -0,0 +1,154 @@
+"""Deterministic sharding of the (budget, seed, case) evaluation grid and partial-result checks."""
+import hashlib
+import json
+import math
+from pathlib import Path
+from typing import List, Tuple
+
+SCHEMA = "hvsmr-shard-partial/2"
+PARTIAL_KEYS = ("shard_index", "num_shards", "grid", "grid_sha256", "inputs_sha256", "items_sha256", "items")
+GRID_KEYS = ("budgets", "seeds", "case_ids", "num_classes", "gt_dir", "pred_template")
+ITEM_KEYS = ("budget", "seed", "case", "gt_sha256", "pred_sha256", "row")
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse 'i/N' into (i, N) with 0 <= i < N."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard spec must look like i/N, got {spec!r}")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"Shard index out of range: {spec!r}")
+    return i, n
+
+
+def build_work_list(budgets: list, seeds: list, case_ids: list) -> List[Tuple[str, int, str]]:
+    """Full grid in fixed order: budget-major, then seed, then case."""
+    return [(b, int(s), c) for b in budgets for s in seeds for c in case_ids]
+
+
+def shard_items(work: list, index: int, num_shards: int) -> list:
+    """Round-robin slice of the work list owned by shard `index`."""
+    return work[index::num_shards]
+
+
+def grid_digest(grid: dict) -> str:
+    """SHA-256 over the grid spec; identical for all shards of one run."""
+    return hashlib.sha256(json.dumps(grid, sort_keys=True).encode()).hexdigest()
+
+
+def file_sha256(path: Path, block: int = 1 << 20) -> str:
+    """SHA-256 of a file's bytes."""
+    h = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def inputs_digest(items: list) -> str:
+    """SHA-256 over (budget, seed, case, gt_sha256, pred_sha256) of each item, in order."""
+    h = hashlib.sha256()
+    for it in items:
+        h.update(("%s|%d|%s|%s|%s\n" % (it["budget"], it["seed"], it["case"], it["gt_sha256"], it["pred_sha256"])).encode())
+    return h.hexdigest()
+
+
+def items_digest(items: list) -> str:
+    """SHA-256 over the canonical JSON of each item, metric rows included."""
+    h = hashlib.sha256()
+    for it in items:
+        h.update((json.dumps(it, sort_keys=True) + "\n").encode())
+    return h.hexdigest()
+
+
+def encode_row(row: dict) -> dict:
+    """Metric row with NaN replaced by None, so partials are strict JSON."""
+    return {k: None if isinstance(v, float) and math.isnan(v) else v for k, v in row.items()}
+
+
+def decode_row(row: dict) -> dict:
+    """Inverse of encode_row."""
+    return {k: float("nan") if v is None else v for k, v in row.items()}
+
+
+def load_partial(path: Path) -> dict:
+    """Load a shard partial and check its schema, grid, input and item checksums."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Partial not found: {path}")
+    try:
+        part = json.loads(path.read_text())
+    except ValueError:
+        raise ValueError(f"{path}: not valid JSON")
+    if not isinstance(part, dict):
+        raise ValueError(f"{path}: malformed partial")
+    if part.get("schema") != SCHEMA:
+        raise ValueError(f"{path}: unexpected schema {part.get('schema')!r}")
+    if (any(k not in part for k in PARTIAL_KEYS) or not isinstance(part["items"], list)
+            or not isinstance(part["grid"], dict) or any(k not in part["grid"] for k in GRID_KEYS)
+            or any(not isinstance(it, dict) or any(k not in it for k in ITEM_KEYS)
+                   or not isinstance(it["row"], dict) for it in part["items"])):
+        raise ValueError(f"{path}: malformed partial")
+    if inputs_digest(part["items"]) != part["inputs_sha256"]:
+        raise ValueError(f"{path}: inputs checksum mismatch (file corrupted or edited)")
+    if items_digest(part["items"]) != part["items_sha256"]:
+        raise ValueError(f"{path}: items checksum mismatch (file corrupted or edited)")
+    if grid_digest(part["grid"]) != part["grid_sha256"]:
+        raise ValueError(f"{path}: grid checksum mismatch (file corrupted or edited)")
+    for it in part["items"]:
+        if it["row"].get("case") != it["case"]:
+            raise ValueError(f"{path}: row for {it['case']} is labelled {it['row'].get('case')!r}")
+        it["row"] = decode_row(it["row"])
+    return part
+
+
+def merge_partials(parts: list) -> dict:
+    """
+    Validate a complete set of partials and return {(budget, seed): [row, ...]}.
+
+    Rows follow the grid's case order. Raises ValueError on mixed runs, missing or
+    duplicate shards, missing or duplicate cases, or inconsistent ground-truth inputs.
+    """
+    if not parts:
+        raise ValueError("No partials to merge")
+    ref = parts[0]
+    n = ref["num_shards"]
+    for p in parts:
+        if p["grid_sha256"] != ref["grid_sha256"] or p["num_shards"] != n:
+            raise ValueError(f"Shard {p['shard_index']}/{p['num_shards']} belongs to a different run "
+                             "(grid, ground truth or prediction source differs)")
+
+    seen_shards = {}
+    for p in parts:
+        i = p["shard_index"]
+        if i in seen_shards:
+            raise ValueError(f"Duplicate shard {i}/{n}")
+        seen_shards[i] = p
+    missing_shards = sorted(set(range(n)) - set(seen_shards))
+    if missing_shards:
+        raise ValueError(f"Missing shards: {', '.join('%d/%d' % (i, n) for i in missing_shards)}")
+
+    grid = ref["grid"]
+    work = build_work_list(grid["budgets"], grid["seeds"], grid["case_ids"])
+    done = {}
+    gt_hash = {}
+    for i in range(n):
+        for it in seen_shards[i]["items"]:
+            key = (it["budget"], it["seed"], it["case"])
+            if key in done:
+                raise ValueError("Duplicate result for budget=%s seed=%d case=%s" % key)
+            if gt_hash.setdefault(it["case"], it["gt_sha256"]) != it["gt_sha256"]:
+                raise ValueError(f"Ground truth for {it['case']} differs between shards")
+            done[key] = it["row"]
+    missing = [w for w in work if w not in done]
+    if missing:
+        raise ValueError("Missing %d case(s), e.g. budget=%s seed=%d case=%s" % ((len(missing),) + missing[0]))
+    extra = set(done) - set(work)
+    if extra:
+        raise ValueError("Unexpected result outside the grid: budget=%s seed=%d case=%s" % sorted(extra)[0])
+
+    out = {}
+    for b, s, c in work:
+        out.setdefault((b, s), []).append(done[(b, s, c)])
+    return out